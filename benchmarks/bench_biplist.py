@@ -0,0 +1,99 @@
+"""Binary plist write/read cost of the vendored biplist as the object count grows.
+
+Times writePlistToString, an eager readPlistFromString, and readPlistLazy
+opening the file and fetching one nested value. The stdlib plistlib binary
+writer is measured alongside as a reference. --against loads another copy of
+biplist (e.g. the file from an older commit) to compare the write path.
+
+    python benchmarks/bench_biplist.py [--sizes 1000 10000 100000] [--against OLD.py] [--json]
+"""
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import plistlib
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'node_modules', 'dmg-builder', 'vendor'))
+import biplist  # noqa: E402
+
+SIZES = [1000, 10000, 100000]
+
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location('biplist_against', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def synthetic_plist(objects, data_type=bytes):
+    # Each entry is six objects: key, array, string, int, real and a dict that
+    # shares its two keys with every other entry.
+    root = {}
+    for i in range(objects // 6):
+        root[f'entry{i:06d}'] = [f'value {i}', i, i / 3, {'data': data_type(b'\x00\x01' * 8), 'date': datetime.datetime(2020, 1, 1)}]
+    return root
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def bench_size(objects, repeat, workdir, against):
+    root = synthetic_plist(objects, biplist.Data)
+    plain = synthetic_plist(objects)
+    results = {}
+
+    results['write'] = measure(lambda: biplist.writePlistToString(root), repeat)
+    if against is not None:
+        results['write_against'] = measure(lambda: against.writePlistToString(root), repeat)
+    results['plistlib_write'] = measure(lambda: plistlib.dumps(plain, fmt=plistlib.FMT_BINARY), repeat)
+
+    data = biplist.writePlistToString(root)
+    path = os.path.join(workdir, f'bench_{objects}.plist')
+    with open(path, 'wb') as f:
+        f.write(data)
+    key = f'entry{objects // 12:06d}'
+
+    results['read'] = measure(lambda: biplist.readPlistFromString(data), repeat)
+    results['lazy_open_lookup'] = measure(lambda: biplist.readPlistLazy(path)[key][3]['date'], repeat)
+    results['plistlib_read'] = measure(lambda: plistlib.loads(data), repeat)
+    results['bytes'] = len(data)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='object counts to generate')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--against', help='path to another biplist/__init__.py to time writes against')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    against = load_module(args.against) if args.against else None
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for objects in args.sizes:
+            report[str(objects)] = bench_size(objects, args.repeat, workdir, against)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for objects, results in report.items():
+        print(f'{objects} objects ({results.pop("bytes")} bytes)')
+        for name, ms in results.items():
+            print(f'  {name:20} {ms:10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Cost of writing a .DS_Store with the vendored ds_store as the entry count grows.
+
+Compares inserting the entries one at a time with DSStore.bulk_load, then
+times a full traversal of the resulting file. Entries are icon positions
+(Iloc) for files in random order, with a comment record on every fourth one,
+which is what a large DMG layout writes.
+
+    python benchmarks/bench_ds_store.py [--sizes 1000 10000 100000] [--json]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'node_modules', 'dmg-builder', 'vendor'))
+from ds_store import DSStore, DSStoreEntry  # noqa: E402
+from ds_store.store import ILocCodec  # noqa: E402
+
+SIZES = [1000, 10000, 100000]
+
+
+def synthetic_entries(count, seed=0):
+    rnd = random.Random(seed)
+    entries = []
+    for i in range(count):
+        name = f'Item {i:06d}.png'
+        if i % 4 == 0:
+            entries.append(DSStoreEntry(name, b'cmmt', 'ustr', f'comment {i}'))
+        else:
+            entries.append(DSStoreEntry(name, b'Iloc', ILocCodec, (i % 40 * 100, i // 40 * 100)))
+    rnd.shuffle(entries)
+    return entries
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def bench_size(count, workdir):
+    entries = synthetic_entries(count)
+    results = {}
+
+    insert_path = os.path.join(workdir, f'insert_{count}.DS_Store')
+
+    def insert():
+        with DSStore.open(insert_path, 'w+') as store:
+            for entry in entries:
+                store.insert(entry)
+
+    results['insert_ms'] = timed(insert)
+
+    bulk_path = os.path.join(workdir, f'bulk_{count}.DS_Store')
+
+    def bulk():
+        with DSStore.open(bulk_path, 'w+') as store:
+            store.bulk_load(entries)
+
+    results['bulk_load_ms'] = timed(bulk)
+
+    def traverse():
+        with DSStore.open(bulk_path, 'r+') as store:
+            assert sum(1 for _ in store) == len(store) == count
+
+    results['traverse_ms'] = timed(traverse)
+    results['insert_bytes'] = os.path.getsize(insert_path)
+    results['bulk_load_bytes'] = os.path.getsize(bulk_path)
+    results['speedup'] = round(results['insert_ms'] / results['bulk_load_ms'], 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help='entry counts to write')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in args.sizes:
+            report[str(count)] = bench_size(count, workdir)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for count, results in report.items():
+        print(f'{count} entries')
+        print(f'  insert     {results["insert_ms"]:10.2f} ms  {results["insert_bytes"]:>10} bytes')
+        print(f'  bulk_load  {results["bulk_load_ms"]:10.2f} ms  {results["bulk_load_bytes"]:>10} bytes'
+              f'  {results["speedup"]:6.1f}x')
+        print(f'  traverse   {results["traverse_ms"]:10.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
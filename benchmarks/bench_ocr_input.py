@@ -0,0 +1,135 @@
+"""Input decode cost of each frame source of ocr.py, without recognition.
+
+Times, in this process, the two halves of handing a captured frame to the
+OCR server: what the capturing side does (encode and write a PNG, write a
+raw file, copy into shared memory) and what the server does to turn it into
+the grayscale image given to tesseract (decode the PNG, or map and convert
+the raw pixels). Inline frames are timed from bytes already read, so the
+pipe transfer is not included, nor is tesseract; bench_pipeline.py times
+whole requests against a running server.
+
+    python benchmarks/bench_ocr_input.py [--repeat 20] [--json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'js'))
+import ocr  # noqa: E402
+
+RESOLUTIONS = [(1920, 1080), (2560, 1440), (3840, 2160)]
+
+
+def synthetic_frame(width, height):
+    image = Image.new('RGB', (width, height), (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    for y in range(20, height, 28):
+        draw.text((20, y), 'Arquivo Editar Exibir Salvar como Cancelar ' * (width // 320), fill=(20, 20, 20))
+    rgb = np.asarray(image)
+    bgra = np.empty((height, width, 4), dtype=np.uint8)
+    bgra[..., :3] = rgb[..., ::-1]
+    bgra[..., 3] = 255
+    return image, bgra
+
+
+def measure(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def bench_resolution(width, height, repeat, workdir):
+    # name -> {'produce': capturing side, 'decode': server side} in ms
+    image, bgra = synthetic_frame(width, height)
+    frame = bgra.tobytes()
+    raw = {'width': width, 'height': height, 'format': 'BGRA'}
+    sources = ocr.RawSources()
+    results = {}
+
+    png_path = os.path.join(workdir, 'autotask.png')
+    png_request = {'image': png_path}
+    results['png_disk'] = {
+        'produce': measure(lambda: image.save(png_path), repeat),
+        'decode': measure(lambda: ocr.load_frame(png_request, sources)[0].convert('L'), repeat),
+    }
+
+    raw_path = os.path.join(workdir, 'autotask.raw')
+    with open(raw_path, 'wb') as f:
+        f.write(frame)
+    file_request = {'raw': dict(raw, source='file', path=raw_path), 'preprocess': {}}
+
+    def write_raw():
+        with open(raw_path, 'r+b') as f:
+            f.write(frame)
+
+    results['mmap_file'] = {
+        'produce': measure(write_raw, repeat),
+        'decode': measure(lambda: ocr.load_frame(file_request, sources), repeat),
+    }
+
+    segment = shared_memory.SharedMemory(create=True, size=len(frame))
+    try:
+        shm_request = {'raw': dict(raw, source='shm', name=segment.name), 'preprocess': {}}
+
+        def copy_to_shm():
+            segment.buf[:len(frame)] = frame
+
+        results['shm'] = {
+            'produce': measure(copy_to_shm, repeat),
+            'decode': measure(lambda: ocr.load_frame(shm_request, sources), repeat),
+        }
+        sources.close()
+        # Attaching in the same process dropped the creator's registration.
+        resource_tracker.register(segment._name, 'shared_memory')
+    finally:
+        segment.close()
+        segment.unlink()
+
+    inline_request = {'raw': dict(raw, source='inline'), '_payload': frame, 'preprocess': {}}
+    results['inline'] = {'decode': measure(lambda: ocr.load_frame(inline_request, sources), repeat)}
+
+    preprocess = {'max_side': 1920, 'binarize': True}
+    full_request = {'raw': dict(raw, source='inline'), '_payload': frame, 'preprocess': preprocess}
+    results['inline_downscale_binarize'] = {
+        'decode': measure(lambda: ocr.load_frame(full_request, sources), repeat)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for width, height in RESOLUTIONS:
+            report[f'{width}x{height}'] = bench_resolution(width, height, args.repeat, workdir)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    print('input decode only: no pipe transfer, no recognition')
+    for resolution, results in report.items():
+        baseline = results['png_disk']['decode']
+        print(resolution)
+        for name, times in results.items():
+            produce = f'{times["produce"]:9.2f} ms' if 'produce' in times else ' ' * 12
+            print(f'  {name:28} produce {produce}  decode {times["decode"]:9.2f} ms'
+                  f'  {baseline / times["decode"]:6.1f}x decode')
+
+
+if __name__ == '__main__':
+    main()
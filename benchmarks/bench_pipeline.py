@@ -0,0 +1,447 @@
+"""End-to-end benchmark of the perception/action pipeline.
+
+Renders synthetic desktops with known text at several resolutions and runs
+every OCR mode of ocr.py cold (first request after start) and warm (median
+of the following ones), recording per-stage timings, throughput, peak RSS
+and word recall. Incremental requests also run on a desktop with a sidebar
+and a scrollbar. The startup stage times a bare interpreter importing
+pytesseract and PIL, the floor every one-shot CLI call pays. With a display
+(or --xvfb on headless Linux) the automator.py stages are measured too.
+Results are written as JSON and can be checked against an earlier run:
+
+    python benchmarks/bench_pipeline.py --out bench.json
+    python benchmarks/bench_pipeline.py --xvfb --compare baseline.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageDraw, ImageFont
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+OCR = os.path.join(ROOT, 'src', 'js', 'ocr.py')
+AUTOMATOR = os.path.join(ROOT, 'src', 'js', 'automator.py')
+
+RESOLUTIONS = {'720p': (1280, 720), '1080p': (1920, 1080), '4k': (3840, 2160)}
+STARTUP_IMPORTS = 'import pytesseract, PIL'
+OCR_MODES = ['cli_png', 'server_png', 'server_raw', 'server_incremental', 'server_parallel']
+# also run on a desktop with a sidebar and a scrollbar, which decide how the frame is tiled
+SIDEBAR_MODES = ['server_incremental']
+ACTION_MODES = ['actions_cli', 'actions_server', 'capture_png', 'capture_raw']
+WORDS = ('Arquivo Editar Exibir Inserir Formatar Ferramentas Ajuda Salvar Cancelar Abrir '
+         'Fechar Janela Pesquisar Enviar Voltar Imprimir Copiar Colar Desfazer Refazer').split()
+DIALOG_TEXT = 'Deseja salvar as alterações no Documento {}?'
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def normalize_words(text):
+    return {w.strip('.,:;!?()[]"\'').casefold() for w in text.split()} - {''}
+
+
+def load_font(size):
+    try:
+        return ImageFont.truetype('DejaVuSans.ttf', size)
+    except OSError:
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:
+            return ImageFont.load_default()
+
+
+class SyntheticDesktop:
+    # A window full of known words; frame(i) adds a dialog whose text changes
+    # every step, the way a task loop sees the screen between actions.
+    def __init__(self, width, height, seed=0, sidebar=False):
+        self.width, self.height = width, height
+        self.font = load_font(max(height // 60, 12))
+        rng = random.Random(seed)
+        self.base = Image.new('RGB', (width, height), (236, 236, 236))
+        draw = ImageDraw.Draw(self.base)
+        draw.rectangle((0, 0, width, height // 30), fill=(40, 40, 48))
+        draw.text((10, 4), 'Documento - Editor', font=self.font, fill=(250, 250, 250))
+        if sidebar:
+            # A sidebar and a scrollbar cross every row of text, so no row of
+            # the frame is blank from edge to edge.
+            draw.rectangle((0, height // 30, 5, height), fill=(220, 220, 220))
+            draw.rectangle((width - 14, height // 30, width - 1, height), fill=(225, 225, 225))
+            draw.rectangle((width - 12, height // 10, width - 3, height // 4), fill=(190, 190, 190))
+        self.expected = {'documento', 'editor'}
+        line_height = int(self.font.size * 1.8)
+        for y in range(height // 30 + line_height, height - line_height, line_height):
+            line = ' '.join(rng.choice(WORDS) for _ in range(width // (self.font.size * 8)))
+            draw.text((20, y), line, font=self.font, fill=(20, 20, 20))
+            self.expected |= normalize_words(line)
+
+    def frame(self, step):
+        image = self.base.copy()
+        draw = ImageDraw.Draw(image)
+        w, h = self.width // 3, self.height // 6
+        x, y = (self.width - w) // 2, (self.height - h) // 2
+        draw.rectangle((x, y, x + w, y + h), fill=(255, 255, 255), outline=(90, 90, 90), width=2)
+        text = DIALOG_TEXT.format(step)
+        draw.text((x + 20, y + 20), text, font=self.font, fill=(0, 0, 0))
+        draw.text((x + 20, y + h - self.font.size * 2), 'Salvar    Cancelar', font=self.font, fill=(0, 0, 0))
+        return image, self.expected | normalize_words(text) | {'salvar', 'cancelar'}
+
+
+def child_pids(pid):
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        if int(stat.rsplit(')', 1)[1].split()[1]) == pid:
+            children.append(int(entry))
+    return children
+
+
+def peak_rss_kb(pid):
+    # VmHWM of the process plus its direct children (the parallel pool).
+    if not os.path.isdir('/proc'):
+        return None
+    total = 0
+    for p in [pid] + child_pids(pid):
+        try:
+            with open(f'/proc/{p}/status') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total
+
+
+def run_child(args):
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, *args], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if hasattr(os, 'wait4'):
+        out = proc.stdout.read()
+        err = proc.stderr.read()
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        rss = usage.ru_maxrss
+    else:
+        out, err = proc.communicate()
+        rss = None
+    ms = elapsed_ms(start)
+    if proc.returncode:
+        raise RuntimeError(f'{" ".join(args)} failed: {err.decode(errors="replace").strip()}')
+    return ms, rss, out.decode(errors='replace')
+
+
+class JsonLinesProcess:
+    def __init__(self, args):
+        self.proc = subprocess.Popen([sys.executable, *args], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.next_id = 0
+
+    def request(self, payload):
+        self.next_id += 1
+        self.proc.stdin.write((json.dumps(dict(payload, id=self.next_id)) + '\n').encode())
+        self.proc.stdin.flush()
+        while True:
+            line = self.proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f'{self.proc.args[1]} exited')
+            response = json.loads(line)
+            if response.get('id') == self.next_id:
+                break
+        if response.get('error'):
+            raise RuntimeError(response['error'])
+        return response
+
+    def peak_rss_kb(self):
+        return peak_rss_kb(self.proc.pid)
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.wait(timeout=60)
+
+
+def summarize(runs, pixels, rss, recall):
+    cold, warm_runs = runs[0], runs[1:] or runs[:1]
+    warm = {key: round(statistics.median(run[key] for run in warm_runs), 2) for key in warm_runs[0]}
+    result = {'cold': cold, 'warm': warm, 'peak_rss_kb': rss}
+    if warm['total_ms']:
+        result['throughput_fps'] = round(1000 / warm['total_ms'], 2)
+        if pixels:
+            result['megapixels_per_s'] = round(pixels / 1e6 * result['throughput_fps'], 2)
+    if recall is not None:
+        result['recall'] = round(recall, 3)
+    return result
+
+
+def recall_of(text, expected):
+    return len(normalize_words(text) & expected) / len(expected)
+
+
+def bench_startup(iterations):
+    samples, rss = [], 0
+    for _ in range(iterations):
+        ms, child_rss, _ = run_child(['-c', STARTUP_IMPORTS])
+        samples.append(ms)
+        rss = max(rss, child_rss or 0)
+    return {'mode': 'startup', 'imports': STARTUP_IMPORTS, 'startup_ms': round(statistics.median(samples), 2),
+            'cold_ms': samples[0], 'peak_rss_kb': rss or None}
+
+
+def bench_cli_png(desktop, iterations, workdir, args):
+    path = os.path.join(workdir, 'autotask.png')
+    runs, rss, recall = [], 0, None
+    for step in range(iterations):
+        image, expected = desktop.frame(step)
+        start = time.perf_counter()
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        encode_ms = elapsed_ms(start)
+        step_start = time.perf_counter()
+        with open(path, 'wb') as f:
+            f.write(buffer.getvalue())
+        write_ms = elapsed_ms(step_start)
+        process_ms, child_rss, text = run_child([OCR, path])
+        rss = max(rss, child_rss or 0)
+        runs.append({'encode_ms': encode_ms, 'write_ms': write_ms, 'process_ms': process_ms,
+                     'total_ms': elapsed_ms(start)})
+        recall = recall_of(text, expected)
+    return runs, rss or None, recall
+
+
+def bench_server(mode, desktop, iterations, workdir, args):
+    server_args = [OCR, '--server']
+    if args.workers:
+        server_args += ['--workers', str(args.workers)]
+    png_path = os.path.join(workdir, 'autotask.png')
+    raw_path = os.path.join(workdir, 'autotask.raw')
+    server = JsonLinesProcess(server_args)
+    runs, recall = [], None
+    try:
+        for step in range(iterations):
+            image, expected = desktop.frame(step)
+            start = time.perf_counter()
+            if mode == 'server_png':
+                image.save(png_path)
+                request = {'image': png_path}
+            else:
+                data = image.tobytes()
+                with open(raw_path, 'r+b' if os.path.exists(raw_path) else 'wb') as f:
+                    f.write(data)
+                request = {'raw': {'source': 'file', 'path': raw_path, 'format': 'RGB',
+                                   'width': image.width, 'height': image.height}}
+            request['incremental'] = mode == 'server_incremental'
+            request['parallel'] = mode == 'server_parallel'
+            prepare_ms = elapsed_ms(start)
+            step_start = time.perf_counter()
+            response = server.request(request)
+            roundtrip_ms = elapsed_ms(step_start)
+            timings = response['timings']
+            run = {'prepare_ms': prepare_ms, 'roundtrip_ms': roundtrip_ms,
+                   'load_ms': timings['load_ms'], 'ocr_ms': timings['ocr_ms'],
+                   'overhead_ms': round(roundtrip_ms - timings['total_ms'], 2),
+                   'total_ms': elapsed_ms(start)}
+            if 'cache' in response:
+                run['cache_hits'] = response['cache']['hits']
+            if 'tiles' in response:
+                run['tiles_recognised'] = response['tiles']['recognised']
+            runs.append(run)
+            recall = recall_of(response['text'], expected)
+        rss = server.peak_rss_kb()
+    finally:
+        server.close()
+    return runs, rss, recall
+
+
+def bench_actions(mode, iterations, workdir):
+    script = [{'action': 'move', 'x': 100, 'y': 100}, {'action': 'move', 'x': 200, 'y': 150},
+              {'action': 'press', 'key': 'shift'}]
+    runs = []
+    if mode == 'actions_cli':
+        rss = 0
+        for _ in range(iterations):
+            run, start = {}, time.perf_counter()
+            for i, spec in enumerate(script):
+                params = [str(spec['key'])] if 'key' in spec else [str(spec['x']), str(spec['y'])]
+                ms, child_rss, _ = run_child([AUTOMATOR, spec['action'], *params])
+                run[f'{spec["action"]}_{i}_ms'] = ms
+                rss = max(rss, child_rss or 0)
+            run['total_ms'] = elapsed_ms(start)
+            runs.append(run)
+        return runs, rss or None
+
+    if mode == 'capture_png':
+        script = [{'action': 'screenshot', 'filename': os.path.join(workdir, 'capture.png')}]
+    elif mode == 'capture_raw':
+        script = [{'action': 'capture', 'path': os.path.join(workdir, 'capture.raw')}]
+    server = JsonLinesProcess([AUTOMATOR, '--server'])
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter()
+            response = server.request({'actions': script})
+            failed = [r for r in response['results'] if not r['ok']]
+            if failed:
+                raise RuntimeError(failed[0]['error'])
+            run = {f'{r["action"]}_{i}_ms': r['ms'] for i, r in enumerate(response['results'])}
+            run['total_ms'] = elapsed_ms(start)
+            runs.append(run)
+        rss = server.peak_rss_kb()
+    finally:
+        server.close()
+    return runs, rss
+
+
+def start_xvfb(display=':99', screen='1920x1080x24'):
+    if not shutil.which('Xvfb'):
+        raise SystemExit('Xvfb not found; install it or run with a display')
+    proc = subprocess.Popen(['Xvfb', display, '-screen', '0', screen, '-nolisten', 'tcp'],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    socket_path = f'/tmp/.X11-unix/X{display.lstrip(":")}'
+    deadline = time.time() + 10
+    while not os.path.exists(socket_path):
+        if proc.poll() is not None or time.time() > deadline:
+            raise SystemExit('Xvfb did not start')
+        time.sleep(0.05)
+    os.environ['DISPLAY'] = display
+    return proc
+
+
+def metadata():
+    try:
+        tesseract = subprocess.run(['tesseract', '--version'], capture_output=True, text=True).stdout.split('\n')[0]
+    except OSError:
+        tesseract = None
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                  capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'tesseract': tesseract,
+        'revision': revision,
+        'display': os.environ.get('DISPLAY'),
+    }
+
+
+def compare(report, baseline, max_regression, max_rss_regression, max_recall_drop):
+    regressions = []
+    for key, result in report['results'].items():
+        old = baseline['results'].get(key)
+        if old and 'startup_ms' in old and 'startup_ms' in result:
+            if result['startup_ms'] > old['startup_ms'] * (1 + max_regression):
+                regressions.append(f'{key}: {old["startup_ms"]} -> {result["startup_ms"]} ms')
+            continue
+        if not old or 'warm' not in old or 'warm' not in result:
+            continue
+        ratio = result['warm']['total_ms'] / max(old['warm']['total_ms'], 1e-6)
+        if ratio > 1 + max_regression:
+            regressions.append(f'{key}: warm total {old["warm"]["total_ms"]} -> {result["warm"]["total_ms"]} ms')
+        if old.get('peak_rss_kb') and result.get('peak_rss_kb'):
+            if result['peak_rss_kb'] > old['peak_rss_kb'] * (1 + max_rss_regression):
+                regressions.append(f'{key}: peak RSS {old["peak_rss_kb"]} -> {result["peak_rss_kb"]} kB')
+        if 'recall' in old and 'recall' in result and old['recall'] - result['recall'] > max_recall_drop:
+            regressions.append(f'{key}: recall {old["recall"]} -> {result["recall"]}')
+    return regressions
+
+
+def summary_lines(report):
+    for key, result in report['results'].items():
+        if 'startup_ms' in result:
+            yield f'{key:34} startup_ms {result["startup_ms"]:10.2f}'
+        elif 'warm' in result:
+            line = f'{key:34} warm_ms    {result["warm"]["total_ms"]:10.2f}  cold_ms {result["cold"]["total_ms"]:10.2f}'
+            if 'recall' in result:
+                line += f'  recall {result["recall"]:.3f}'
+            yield line
+        else:
+            yield f'{key:34} skipped: {result.get("skipped")}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--iterations', type=int, default=5, help='runs per mode; the first is the cold one')
+    parser.add_argument('--resolutions', default='720p,1080p,4k', help=f'any of {",".join(RESOLUTIONS)}')
+    parser.add_argument('--modes', default=','.join(['startup'] + OCR_MODES + ACTION_MODES))
+    parser.add_argument('--workers', type=int, help='--workers passed to the OCR server')
+    parser.add_argument('--xvfb', action='store_true', help='run the action stages on a fresh Xvfb display')
+    parser.add_argument('--out', help='write the JSON report here instead of stdout')
+    parser.add_argument('--compare', help='baseline JSON report to check for regressions')
+    parser.add_argument('--max-regression', type=float, default=0.15, help='allowed warm time increase')
+    parser.add_argument('--max-rss-regression', type=float, default=0.25, help='allowed peak RSS increase')
+    parser.add_argument('--max-recall-drop', type=float, default=0.05, help='allowed absolute recall drop')
+    args = parser.parse_args()
+
+    modes = args.modes.split(',')
+    xvfb = start_xvfb() if args.xvfb else None
+    report = {'meta': metadata(), 'results': {}}
+    try:
+        if 'startup' in modes:
+            print('startup', file=sys.stderr)
+            report['results']['startup'] = bench_startup(args.iterations)
+
+        with tempfile.TemporaryDirectory() as workdir:
+            for name in args.resolutions.split(','):
+                width, height = RESOLUTIONS[name]
+                desktops = [('', SyntheticDesktop(width, height)),
+                            ('+sidebar', SyntheticDesktop(width, height, sidebar=True))]
+                for suffix, desktop in desktops:
+                    for mode in modes:
+                        if mode not in OCR_MODES or (suffix and mode not in SIDEBAR_MODES):
+                            continue
+                        key = f'{mode}@{name}{suffix}'
+                        print(key, file=sys.stderr)
+                        bench = bench_cli_png if mode == 'cli_png' else lambda *a: bench_server(mode, *a)
+                        runs, rss, recall = bench(desktop, args.iterations, workdir, args)
+                        report['results'][key] = dict(
+                            summarize(runs, width * height, rss, recall), mode=mode, resolution=name)
+
+            for mode in modes:
+                if mode not in ACTION_MODES:
+                    continue
+                if not os.environ.get('DISPLAY') and sys.platform.startswith('linux'):
+                    report['results'][mode] = {'mode': mode, 'skipped': 'no display; use --xvfb'}
+                    continue
+                print(mode, file=sys.stderr)
+                runs, rss = bench_actions(mode, args.iterations, workdir)
+                report['results'][mode] = dict(summarize(runs, None, rss, None), mode=mode)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+
+    for line in summary_lines(report):
+        print(line, file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.max_regression,
+                                  args.max_rss_regression, args.max_recall_drop)
+        for line in regressions:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
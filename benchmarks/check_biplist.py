@@ -0,0 +1,140 @@
+"""Randomized round-trip check of the vendored biplist.
+
+Generates nested plists with every supported value type and checks that
+readPlistFromString and readPlistLazy give back what writePlistToString was
+given. --against loads another copy of biplist (e.g. the file from an older
+commit) and also checks that both writers produce byte-identical output and
+that the other copy reads the files written by this one.
+
+    git show <rev>:node_modules/dmg-builder/vendor/biplist/__init__.py > /tmp/biplist_old.py
+    python benchmarks/check_biplist.py [--seeds 200] [--against /tmp/biplist_old.py]
+"""
+import argparse
+import datetime
+import importlib.util
+import os
+import random
+import sys
+import tempfile
+import warnings
+
+# biplist computes its reference date with the deprecated utcfromtimestamp
+warnings.simplefilter('ignore', DeprecationWarning)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'node_modules', 'dmg-builder', 'vendor'))
+import biplist  # noqa: E402
+
+INTEGERS = [0, 1, -1, 14, 15, 16, 255, 256, 65535, 65536, 2 ** 31, 2 ** 32, -2 ** 63, 2 ** 63 - 1]
+TEXT = 'abcxyz 0123'
+UNICODE = 'açãoé€日本\U0001F600'
+# around the 15-item marker limit and the 1, 2 and 4 byte length encodings
+LENGTHS = [0, 1, 14, 15, 16, 255, 256, 65535, 65536]
+
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location('biplist_against', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def converted(obj, module):
+    # The same plist built from another copy's Uid and Data classes, which
+    # its writer requires.
+    if isinstance(obj, dict):
+        return {key: converted(value, module) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [converted(value, module) for value in obj]
+    if isinstance(obj, biplist.Uid):
+        return module.Uid(obj.integer)
+    if isinstance(obj, biplist.Data):
+        return module.Data(obj)
+    return obj
+
+
+def random_string(rng):
+    if rng.random() < 0.05:
+        return 'x' * rng.choice(LENGTHS)
+    alphabet = UNICODE if rng.random() < 0.3 else TEXT
+    return ''.join(rng.choice(alphabet) for _ in range(rng.randrange(30)))
+
+
+def random_scalar(rng):
+    kind = rng.randrange(8)
+    if kind == 0:
+        return random_string(rng)
+    if kind == 1:
+        return rng.choice(INTEGERS + [rng.randrange(-2 ** 40, 2 ** 40)])
+    if kind == 2:
+        return rng.choice([0.0, -1.5, 1e300, rng.random() * 1000])
+    if kind == 3:
+        return rng.random() < 0.5
+    if kind == 4:
+        size = rng.choice(LENGTHS) if rng.random() < 0.05 else rng.randrange(40)
+        return biplist.Data(bytes(rng.randrange(256) for _ in range(size)))
+    if kind == 5:
+        return datetime.datetime(2001, 1, 1) + datetime.timedelta(seconds=rng.randrange(-10 ** 9, 10 ** 9))
+    if kind == 6:
+        # repeated values are written once and shared by reference
+        return rng.choice(['Iloc', 'bwsp', '', 'é', 1, 2.5])
+    return biplist.Uid(rng.randrange(2 ** 32))
+
+
+def random_plist(rng, budget, depth=0):
+    # Containers get smaller with depth and the shared budget caps the
+    # number of objects; the root is always a dictionary.
+    budget[0] -= 1
+    if depth and (depth > 5 or budget[0] <= 0 or rng.random() < 0.6):
+        return random_scalar(rng)
+    count = rng.randrange(40 if depth == 0 else 20 // depth)
+    kind = 0 if depth == 0 else rng.randrange(3)
+    if kind == 0:
+        return {random_string(rng): random_plist(rng, budget, depth + 1) for _ in range(count)}
+    if kind == 1:
+        return [random_plist(rng, budget, depth + 1) for _ in range(count)]
+    return {random_string(rng) for _ in range(count)}
+
+
+def check_seed(seed, workdir, against):
+    rng = random.Random(seed)
+    root = random_plist(rng, [rng.choice([10, 100, 1000, 5000])])
+    data = biplist.writePlistToString(root)
+    problems = []
+    if biplist.readPlistFromString(data) != root:
+        problems.append('readPlistFromString differs')
+    path = os.path.join(workdir, 'check.plist')
+    with open(path, 'wb') as f:
+        f.write(data)
+    if biplist.readPlistLazy(path) != root:
+        problems.append('readPlistLazy differs')
+    if against is not None:
+        other = converted(root, against)
+        if against.writePlistToString(other) != data:
+            problems.append('not byte-identical to --against')
+        if against.readPlistFromString(data) != other:
+            problems.append('--against reads it back differently')
+    return problems, len(data)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seeds', type=int, default=200, help='random plists to check')
+    parser.add_argument('--against', help='path to another biplist/__init__.py to compare output with')
+    args = parser.parse_args()
+
+    against = load_module(args.against) if args.against else None
+    failures = 0
+    total = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        for seed in range(args.seeds):
+            problems, size = check_seed(seed, workdir, against)
+            total += size
+            for problem in problems:
+                print(f'seed {seed}: {problem}')
+            failures += bool(problems)
+    print(f'{args.seeds} plists, {total} bytes, {failures} failing')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Randomized consistency check of the vendored ds_store B-tree.
+
+Fills stores with random records, then deletes them all in random order,
+re-inserting some on the way, and reopens the file every so often to check
+its records, its record count and that the node count in the header matches
+the nodes reachable from the root. Stores built with bulk_load are checked
+against the same records inserted one at a time, and then loaded on top of,
+deleted from and inserted into.
+
+    python benchmarks/check_ds_store.py [--seeds 40]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'node_modules', 'dmg-builder', 'vendor'))
+from ds_store import DSStore, DSStoreEntry  # noqa: E402
+from ds_store.store import ILocCodec  # noqa: E402
+
+# (shortest, longest) comment; long ones leave few records per node
+VALUE_SIZES = [(1, 20), (5, 200), (300, 1000), (1, 1000)]
+COUNTS = [50, 300, 1500]
+CHECK_EVERY = 97
+
+
+def reachable_nodes(store):
+    # Leaves start with a zero pointer; internal nodes hold a child pointer
+    # before every record and the rightmost child in the header.
+    seen = 0
+    stack = [store._rootnode]
+    while stack:
+        node = stack.pop()
+        seen += 1
+        with store._get_block(node) as block:
+            next_node, count = block.read(b'>II')
+            if next_node:
+                for _ in range(count):
+                    stack.append(block.read(b'>I')[0])
+                    DSStoreEntry.read(block)
+                stack.append(next_node)
+    return seen
+
+
+def records(store):
+    return [((e.filename.lower(), e.code), e.value) for e in store]
+
+
+def check(path, live):
+    # Reopens the file, so whatever was flushed is what gets checked.
+    with DSStore.open(path, 'r+') as store:
+        if records(store) != sorted(live.items()):
+            return 'records differ'
+        if len(store) != len(live):
+            return f'len {len(store)}, expected {len(live)}'
+        if reachable_nodes(store) != store._nodes:
+            return f'{reachable_nodes(store)} reachable nodes, header says {store._nodes}'
+    return None
+
+
+def check_deletes(seed, workdir):
+    rnd = random.Random(seed)
+    shortest, longest = rnd.choice(VALUE_SIZES)
+    path = os.path.join(workdir, f'delete{seed}')
+    live = {}
+    with DSStore.open(path, 'w+') as store:
+        for _ in range(rnd.choice(COUNTS)):
+            name = f'F{rnd.randrange(100000):05d}'
+            code = rnd.choice([b'cmmt', b'cmnt'])
+            value = 'x' * rnd.randint(shortest, longest)
+            store.insert(DSStoreEntry(name, code, 'ustr', value))
+            live[(name.lower(), code)] = value
+    problem = check(path, live)
+    if problem:
+        return f'after inserts: {problem}'
+
+    keys = sorted(live)
+    rnd.shuffle(keys)
+    with DSStore.open(path, 'r+') as store:
+        for step, key in enumerate(keys, 1):
+            if rnd.random() < 0.3:
+                value = 'y' * rnd.randint(shortest, longest)
+                store.insert(DSStoreEntry(key[0].upper(), key[1], 'ustr', value))
+                live[key] = value
+            store.delete(key[0], key[1])
+            del live[key]
+            if step % CHECK_EVERY == 0:
+                store.flush()
+                problem = check(path, live)
+                if problem:
+                    return f'after {step} deletes: {problem}'
+    return check(path, live)
+
+
+def random_entries(rnd, count):
+    entries = []
+    for i in range(count):
+        name = f'File {rnd.randrange(10 ** 6):06d}.{rnd.choice(["png", "TXT", "app"])}'
+        entries.append(DSStoreEntry(name, b'Iloc', ILocCodec, (i % 2000, i // 2000)))
+        if i % 3 == 0:
+            entries.append(DSStoreEntry(name, b'cmmt', 'ustr', f'comment {i}'))
+    return entries
+
+
+def expected(entries):
+    # Later entries replace earlier ones with the same name and code.
+    return {(e.filename.lower(), e.code): e.value for e in entries}
+
+
+def check_bulk_load(seed, workdir):
+    rnd = random.Random(seed)
+    entries = random_entries(rnd, rnd.choice([0, 1, 50, 3000]))
+    inserted = os.path.join(workdir, f'insert{seed}')
+    loaded = os.path.join(workdir, f'bulk{seed}')
+    with DSStore.open(inserted, 'w+') as store:
+        for entry in entries:
+            store.insert(entry)
+    with DSStore.open(loaded, 'w+') as store:
+        store.bulk_load(entries)
+    live = expected(entries)
+    for path in (inserted, loaded):
+        problem = check(path, live)
+        if problem:
+            return f'{os.path.basename(path)}: {problem}'
+    if not entries:
+        return None
+
+    more = random_entries(rnd, len(entries) // 2)
+    more.append(DSStoreEntry(entries[0].filename.upper(), entries[0].code, ILocCodec, (7, 7)))
+    with DSStore.open(loaded, 'r+') as store:
+        store.bulk_load(more)
+    live.update(expected(more))
+    problem = check(loaded, live)
+    if problem:
+        return f'bulk_load on top: {problem}'
+
+    names = {(e.filename.lower(), e.code): e.filename for e in entries + more}
+    with DSStore.open(loaded, 'r+') as store:
+        for key in sorted(live)[::5]:
+            store.delete(names[key], key[1])
+            del live[key]
+        store.insert(DSStoreEntry('zzz', b'Iloc', ILocCodec, (1, 2)))
+        live[('zzz', b'Iloc')] = (1, 2)
+    problem = check(loaded, live)
+    if problem:
+        return f'delete and insert after bulk_load: {problem}'
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--seeds', type=int, default=40, help='random stores per check')
+    args = parser.parse_args()
+
+    checks = [('deletes', check_deletes), ('bulk_load', check_bulk_load)]
+    failures = 0
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, fn in checks:
+            failed = 0
+            for seed in range(args.seeds):
+                try:
+                    problem = fn(seed, workdir)
+                except Exception as e:
+                    problem = f'{type(e).__name__}: {e}'
+                if problem:
+                    failed += 1
+                    print(f'{name} seed {seed}: {problem}')
+            print(f'{name}: {args.seeds} stores, {failed} failing')
+            failures += failed
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
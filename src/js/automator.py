@@ -1,30 +1,323 @@
-import pyautogui
+import argparse
+import json
+import os
 import sys
 import time
 
-if len(sys.argv) < 3:
-    print('Usage: python automator.py <action> <params>')
-    sys.exit(1)
+import pyautogui
+from PIL import ImageGrab
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import mss
+except ImportError:
+    mss = None
+
+DIFF_THRESHOLD = 16
+DIFF_STEP = 4
+
+_ocr_engine = None
+_grabber = None
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+def click(x, y, button='left', clicks=1):
+    x, y = int(x), int(y)
+    pyautogui.click(x, y, clicks=clicks, button=button)
+    return f'Clicked at ({x}, {y})'
+
+
+def write(text, interval=0.0):
+    pyautogui.write(text, interval=interval)
+    return f'Wrote: {text}'
+
+
+def move(x, y, duration=0.0):
+    x, y = int(x), int(y)
+    pyautogui.moveTo(x, y, duration=duration)
+    return f'Moved to ({x}, {y})'
 
-action = sys.argv[1]
-params = sys.argv[2:]
 
-if action == 'click':
-    x, y = int(params[0]), int(params[1])
+def press(key, presses=1):
+    pyautogui.press(key, presses=presses)
+    return f'Pressed {key}'
+
+
+def hotkey(keys):
+    pyautogui.hotkey(*keys)
+    return f'Pressed {"+".join(keys)}'
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return f'Slept {seconds}s'
+
+
+def click_text(text, min_score=0.75):
+    global _ocr_engine
+    if np is None:
+        raise RuntimeError('click_text needs numpy (pip install numpy)')
+    from ocr import OcrEngine, SpatialIndex
+    if _ocr_engine is None:
+        _ocr_engine = OcrEngine()
+    words = _ocr_engine.image_to_data(pyautogui.screenshot())
+    matches = SpatialIndex(words).find_text(text, min_score=min_score, limit=1)
+    if not matches:
+        raise LookupError(f'Text not found: {text}')
+    x, y = matches[0]['center']
     pyautogui.click(x, y)
-    print(f'Clicked at ({x}, {y})')
-elif action == 'write':
-    text = ' '.join(params)
-    pyautogui.write(text)
-    print(f'Wrote: {text}')
-elif action == 'move':
-    x, y = int(params[0]), int(params[1])
-    pyautogui.moveTo(x, y)
-    print(f'Moved to ({x}, {y})')
-elif action == 'screenshot':
-    filename = params[0] if params else f'screenshot_{int(time.time())}.png'
+    return f'Clicked "{matches[0]["text"]}" at ({x}, {y})'
+
+
+def screenshot(filename=None):
+    filename = filename or f'screenshot_{int(time.time())}.png'
     pyautogui.screenshot(filename)
-    print(f'Screenshot saved as {filename}')
-else:
-    print('Unknown action')
-    sys.exit(2)
+    return f'Screenshot saved as {filename}'
+
+
+class ScreenGrabber:
+    # Raw pixels straight from the display: mss hands back BGRA bytes, the
+    # ImageGrab fallback an RGB image. Neither path encodes a PNG.
+    def __init__(self):
+        self._mss = mss.mss() if mss is not None else None
+
+    def grab(self, region=None):
+        if self._mss is not None:
+            if region is None:
+                area = self._mss.monitors[0]
+            else:
+                x, y, w, h = (int(v) for v in region)
+                area = {'left': x, 'top': y, 'width': w, 'height': h}
+            shot = self._mss.grab(area)
+            pixels = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+            return pixels, 'BGRA', (shot.left, shot.top)
+        if region is None:
+            return np.asarray(ImageGrab.grab()), 'RGB', (0, 0)
+        x, y, w, h = (int(v) for v in region)
+        return np.asarray(ImageGrab.grab(bbox=(x, y, x + w, y + h))), 'RGB', (x, y)
+
+
+def grabber():
+    global _grabber
+    if np is None:
+        raise RuntimeError('capture, wait_stable and wait_change need numpy (pip install numpy)')
+    if _grabber is None:
+        _grabber = ScreenGrabber()
+    return _grabber
+
+
+def capture(path, region=None):
+    # Writes the pixels in place so an ocr.py server keeps its mapping of the
+    # file; the returned header can be sent to it as the "raw" field.
+    pixels, fmt, _ = grabber().grab(region)
+    data = np.ascontiguousarray(pixels)
+    mode = 'r+b' if os.path.exists(path) and os.path.getsize(path) == data.nbytes else 'wb'
+    with open(path, mode) as f:
+        f.write(data.data)
+    height, width, bpp = data.shape
+    return {'source': 'file', 'path': path, 'format': fmt,
+            'width': width, 'height': height, 'stride': width * bpp}
+
+
+def sample(region, step):
+    # A strided view of one channel (green in both formats) is enough to see
+    # whether anything moved, and costs a fraction of a full conversion.
+    pixels, _, origin = grabber().grab(region)
+    return pixels[::step, ::step, 1].astype(np.int16), origin
+
+
+def changed_box(mask, origin, step):
+    rows = np.flatnonzero(mask.any(axis=1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    x, y = origin
+    return [x + int(cols[0]) * step, y + int(rows[0]) * step,
+            int(cols[-1] - cols[0] + 1) * step, int(rows[-1] - rows[0] + 1) * step]
+
+
+def wait_stable(region=None, timeout=5.0, interval=0.05, settle=0.2, threshold=DIFF_THRESHOLD, step=DIFF_STEP):
+    # Polls until no sampled pixel has changed for `settle` seconds. The box
+    # covers everything that changed while waiting.
+    start = time.perf_counter()
+    previous, origin = sample(region, step)
+    changed = np.zeros(previous.shape, dtype=bool)
+    quiet_since = start
+    polls = 1
+    while True:
+        now = time.perf_counter()
+        if now - quiet_since >= settle:
+            stable = True
+            break
+        if now - start >= timeout:
+            stable = False
+            break
+        time.sleep(interval)
+        frame, _ = sample(region, step)
+        polls += 1
+        if frame.shape != previous.shape:
+            changed = np.ones(frame.shape, dtype=bool)
+            quiet_since = time.perf_counter()
+        else:
+            diff = np.abs(frame - previous) > threshold
+            if diff.any():
+                changed |= diff
+                quiet_since = time.perf_counter()
+        previous = frame
+    return {'stable': stable, 'polls': polls, 'elapsed_ms': elapsed_ms(start),
+            'changed_box': changed_box(changed, origin, step)}
+
+
+def wait_change(region=None, timeout=5.0, interval=0.05, threshold=DIFF_THRESHOLD, step=DIFF_STEP, min_pixels=4):
+    start = time.perf_counter()
+    baseline, origin = sample(region, step)
+    polls = 1
+    while time.perf_counter() - start < timeout:
+        time.sleep(interval)
+        frame, _ = sample(region, step)
+        polls += 1
+        if frame.shape != baseline.shape:
+            box = changed_box(np.ones(frame.shape, dtype=bool), origin, step)
+            return {'changed': True, 'polls': polls, 'elapsed_ms': elapsed_ms(start), 'changed_box': box}
+        diff = np.abs(frame - baseline) > threshold
+        if np.count_nonzero(diff) >= min_pixels:
+            return {'changed': True, 'polls': polls, 'elapsed_ms': elapsed_ms(start),
+                    'changed_box': changed_box(diff, origin, step)}
+    return {'changed': False, 'polls': polls, 'elapsed_ms': elapsed_ms(start), 'changed_box': None}
+
+
+ACTIONS = {
+    'click': click,
+    'write': write,
+    'move': move,
+    'press': press,
+    'hotkey': hotkey,
+    'sleep': sleep,
+    'click_text': click_text,
+    'screenshot': screenshot,
+    'capture': capture,
+    'wait_stable': wait_stable,
+    'wait_change': wait_change,
+}
+
+
+def run_action(spec):
+    spec = dict(spec)
+    name = spec.pop('action', None)
+    if name not in ACTIONS:
+        raise ValueError(f'Unknown action: {name}')
+    return ACTIONS[name](**spec)
+
+
+def run_script(script, default_pause=0.0):
+    # Runs the actions in order with our own pacing instead of pyautogui.PAUSE;
+    # by default the first failure skips the rest of the batch.
+    pause = script.get('pause', default_pause)
+    stop_on_error = script.get('stop_on_error', True)
+    actions = script.get('actions', [])
+    if not isinstance(actions, list):
+        raise ValueError('"actions" must be a list')
+    results = []
+    start = time.perf_counter()
+    for i, spec in enumerate(actions):
+        if i and pause:
+            time.sleep(pause)
+        step = time.perf_counter()
+        result = {'action': spec.get('action') if isinstance(spec, dict) else None}
+        try:
+            if not isinstance(spec, dict):
+                raise ValueError('action must be a JSON object')
+            result['result'] = run_action(spec)
+            result['ok'] = True
+        except Exception as e:
+            result['error'] = str(e)
+            result['ok'] = False
+        result['ms'] = elapsed_ms(step)
+        results.append(result)
+        if not result['ok'] and stop_on_error:
+            break
+    return {'results': results, 'timings': {'total_ms': elapsed_ms(start)}}
+
+
+def reply(response):
+    sys.stdout.write(json.dumps(response) + '\n')
+    sys.stdout.flush()
+
+
+def serve(default_pause):
+    pyautogui.PAUSE = 0
+    reply({'id': None, 'ready': True})
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            script = json.loads(line)
+        except ValueError as e:
+            reply({'id': None, 'error': f'invalid JSON: {e}'})
+            continue
+        if not isinstance(script, dict):
+            reply({'id': None, 'error': 'request must be a JSON object'})
+            continue
+        response = {'id': script.get('id')}
+        try:
+            response.update(run_script(script, default_pause))
+        except Exception as e:
+            response['error'] = str(e)
+        reply(response)
+
+
+def parse_cli(action, params):
+    if action in ('click', 'move'):
+        return {'action': action, 'x': params[0], 'y': params[1]}
+    if action in ('write', 'click_text'):
+        return {'action': action, 'text': ' '.join(params)}
+    if action == 'press':
+        return {'action': action, 'key': params[0]}
+    if action == 'hotkey':
+        return {'action': action, 'keys': params}
+    if action == 'screenshot':
+        return {'action': action, 'filename': params[0] if params else None}
+    if action == 'capture':
+        region = [int(v) for v in params[1:5]] or None
+        return {'action': action, 'path': params[0], 'region': region}
+    if action in ('wait_stable', 'wait_change'):
+        region = [int(v) for v in params[1:5]] or None
+        return {'action': action, 'timeout': float(params[0]), 'region': region}
+    return None
+
+
+def main():
+    if len(sys.argv) >= 2 and sys.argv[1] == '--server':
+        parser = argparse.ArgumentParser(usage='python automator.py --server [--pause SECONDS]')
+        parser.add_argument('--server', action='store_true')
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='default delay between actions of a script')
+        serve(parser.parse_args().pause)
+        return
+
+    if len(sys.argv) < 3:
+        print('Usage: python automator.py <action> <params>')
+        sys.exit(1)
+
+    spec = parse_cli(sys.argv[1], sys.argv[2:])
+    if spec is None:
+        print('Unknown action')
+        sys.exit(2)
+    try:
+        result = run_action(spec)
+        print(result if isinstance(result, str) else json.dumps(result))
+    except LookupError as e:
+        print(e)
+        sys.exit(3)
+
+
+if __name__ == '__main__':
+    main()
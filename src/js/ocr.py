@@ -1,11 +1,1116 @@
+import argparse
+import base64
+import hashlib
+import io
+import json
+import math
+import mmap
+import multiprocessing
+import os
+import queue
+import socket
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from difflib import SequenceMatcher
+from multiprocessing import resource_tracker, shared_memory
+
 import pytesseract
 from PIL import Image
-import sys
 
-if len(sys.argv) < 2:
-    print('Usage: python ocr.py <image_path>')
-    sys.exit(1)
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+DEFAULT_LANG = 'por'
+DEFAULT_TILE_SIZE = (512, 256)
+DEFAULT_CACHE_MB = 32
+BLANK_THRESHOLD = 8
+# narrower runs of blank lines are the gaps between letters, not words or lines
+MIN_GAP = 3
+INDEX_CELL = 128
+BAND_OVERLAP = 64
+MIN_BAND_HEIGHT = 200
+# bytes per pixel and the positions of R, G, B in each raw pixel format
+PIXEL_FORMATS = {
+    'L': (1, None),
+    'RGB': (3, (0, 1, 2)),
+    'RGBA': (4, (0, 1, 2)),
+    'BGR': (3, (2, 1, 0)),
+    'BGRA': (4, (2, 1, 0)),
+}
+
+
+def elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 2)
+
+
+class OcrEngine:
+    # Keeps one tesseract API per (lang, psm) alive when tesserocr is
+    # available; otherwise every call goes through the pytesseract CLI.
+    def __init__(self):
+        self._apis = {}
+
+    def _api(self, lang, psm):
+        key = (lang, psm)
+        api = self._apis.get(key)
+        if api is None:
+            if psm is None:
+                api = tesserocr.PyTessBaseAPI(lang=lang)
+            else:
+                api = tesserocr.PyTessBaseAPI(lang=lang, psm=psm)
+            self._apis[key] = api
+        return api
+
+    def warm(self, lang=DEFAULT_LANG):
+        if tesserocr is not None:
+            self._api(lang, None)
+
+    def image_to_string(self, image, lang=DEFAULT_LANG, psm=None, config=''):
+        if tesserocr is not None and not config:
+            api = self._api(lang, psm)
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        if psm is not None:
+            config = f'--psm {psm} {config}'.strip()
+        return pytesseract.image_to_string(image, lang=lang, config=config)
+
+    def image_to_data(self, image, lang=DEFAULT_LANG, psm=None, config=''):
+        if tesserocr is not None and not config:
+            api = self._api(lang, psm)
+            api.SetImage(image)
+            api.Recognize()
+            return WordBoxes.from_iterator(api.GetIterator())
+        if psm is not None:
+            config = f'--psm {psm} {config}'.strip()
+        data = pytesseract.image_to_data(image, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+        return WordBoxes.from_tesseract_dict(data)
+
+    def close(self):
+        for api in self._apis.values():
+            api.End()
+        self._apis.clear()
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return text.casefold().strip('.,:;!?()[]{}"\'')
+
+
+class WordBoxes:
+    # Words in reading order held in parallel arrays; boxes are x0, y0, x1, y1.
+    # Line and block ids are contiguous runs, so grouping is a split on change.
+    def __init__(self, texts, boxes, conf, lines, blocks):
+        self.texts = list(texts)
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32)
+        self.lines = np.asarray(lines, dtype=np.int32)
+        self.blocks = np.asarray(blocks, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def nbytes(self):
+        arrays = self.boxes.nbytes + self.conf.nbytes + self.lines.nbytes + self.blocks.nbytes
+        return arrays + sum(sys.getsizeof(t) for t in self.texts)
+
+    @classmethod
+    def from_rows(cls, rows):
+        if not rows:
+            return cls([], [], [], [], [])
+        texts, boxes, conf, lines, blocks = zip(*rows)
+        return cls(texts, boxes, conf, lines, blocks)
+
+    @classmethod
+    def from_tesseract_dict(cls, data):
+        rows = []
+        line_ids = {}
+        for i, text in enumerate(data['text']):
+            text = text.strip()
+            if data['level'][i] != 5 or not text:
+                continue
+            line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            line = line_ids.setdefault(line_key, len(line_ids))
+            x, y = data['left'][i], data['top'][i]
+            box = (x, y, x + data['width'][i], y + data['height'][i])
+            rows.append((text, box, float(data['conf'][i]), line, data['block_num'][i]))
+        return cls.from_rows(rows)
+
+    @classmethod
+    def from_iterator(cls, iterator):
+        rows = []
+        line = block = -1
+        word = tesserocr.RIL.WORD
+        for result in tesserocr.iterate_level(iterator, word):
+            if result.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                block += 1
+            if result.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line += 1
+            text = (result.GetUTF8Text(word) or '').strip()
+            box = result.BoundingBox(word)
+            if text and box:
+                rows.append((text, box, result.Confidence(word), line, block))
+        return cls.from_rows(rows)
+
+    @classmethod
+    def concat(cls, parts):
+        # parts are (words, (dx, dy)); ids are renumbered so they stay unique.
+        texts, boxes, conf, lines, blocks = [], [], [], [], []
+        line_base = block_base = 0
+        for words, (dx, dy) in parts:
+            if not len(words):
+                continue
+            texts.extend(words.texts)
+            boxes.append(words.boxes + np.array([dx, dy, dx, dy], dtype=np.int32))
+            conf.append(words.conf)
+            lines.append(words.lines - words.lines.min() + line_base)
+            blocks.append(words.blocks - words.blocks.min() + block_base)
+            line_base = int(lines[-1].max()) + 1
+            block_base = int(blocks[-1].max()) + 1
+        if not texts:
+            return cls([], [], [], [], [])
+        return cls(texts, np.concatenate(boxes), np.concatenate(conf), np.concatenate(lines), np.concatenate(blocks))
+
+    def reflowed(self):
+        # Regroups words recognised piece by piece into lines: a word whose
+        # vertical centre is above the baseline of the line being built joins
+        # it. Lines read top to bottom and left to right, and a gap taller
+        # than the line above starts a new block.
+        boxes = self.boxes.tolist()
+        centres = [(y0 + y1) / 2 for _, y0, _, y1 in boxes]
+        lines = []
+        for i in sorted(range(len(boxes)), key=lambda i: (centres[i], boxes[i][0])):
+            if lines and centres[i] < lines[-1][0]:
+                lines[-1][0] = min(lines[-1][0], boxes[i][3])
+                lines[-1][1].append(i)
+            else:
+                lines.append([boxes[i][3], [i]])
+        rows = []
+        block = 0
+        previous = None
+        for line, (_, members) in enumerate(lines):
+            members.sort(key=lambda i: boxes[i][0])
+            top = min(boxes[i][1] for i in members)
+            bottom = max(boxes[i][3] for i in members)
+            if previous is not None and top - previous[1] > previous[1] - previous[0]:
+                block += 1
+            previous = (top, bottom)
+            rows.extend((self.texts[i], boxes[i], float(self.conf[i]), line, block) for i in members)
+        return WordBoxes.from_rows(rows)
+
+    def select(self, mask):
+        idx = np.flatnonzero(mask)
+        return WordBoxes([self.texts[i] for i in idx], self.boxes[idx], self.conf[idx],
+                         self.lines[idx], self.blocks[idx])
+
+    def transformed(self, scale=1, dx=0, dy=0):
+        boxes = self.boxes * scale + np.array([dx, dy, dx, dy], dtype=np.int32)
+        return WordBoxes(self.texts, boxes, self.conf, self.lines, self.blocks)
+
+    def _runs(self, ids):
+        if not len(self):
+            return []
+        return np.split(np.arange(len(self)), np.flatnonzero(np.diff(ids)) + 1)
+
+    def _group(self, ids):
+        groups = []
+        for run in self._runs(ids):
+            box = self.boxes[run]
+            x0, y0 = box[:, :2].min(axis=0).tolist()
+            x1, y1 = box[:, 2:].max(axis=0).tolist()
+            groups.append((' '.join(self.texts[i] for i in run), (x0, y0, x1, y1)))
+        return groups
+
+    def text(self):
+        blocks = []
+        for run in self._runs(self.blocks):
+            lines = {}
+            for i in run:
+                lines.setdefault(int(self.lines[i]), []).append(self.texts[i])
+            blocks.append('\n'.join(' '.join(words) for words in lines.values()))
+        return '\n\n'.join(blocks)
+
+    def to_json(self):
+        def rect(box):
+            x0, y0, x1, y1 = box
+            return [x0, y0, x1 - x0, y1 - y0]
+
+        words = [
+            [text, *rect(box), round(conf, 1), line, block]
+            for text, box, conf, line, block in zip(
+                self.texts, self.boxes.tolist(), self.conf.tolist(), self.lines.tolist(), self.blocks.tolist())
+        ]
+        return {
+            'words': words,
+            'lines': [[text, *rect(box)] for text, box in self._group(self.lines)],
+            'blocks': [[text, *rect(box)] for text, box in self._group(self.blocks)],
+        }
+
+
+class SpatialIndex:
+    # Uniform grid over word boxes for region queries plus a normalised-text
+    # table for exact hits; fuzzy lookups fall back to SequenceMatcher after a
+    # per-character count filter over every window at once.
+    def __init__(self, words, cell=INDEX_CELL):
+        self.words = words
+        self.cell = cell
+        self.cells = {}
+        for i, (x0, y0, x1, y1) in enumerate((words.boxes // cell).tolist()):
+            for gx in range(x0, x1 + 1):
+                for gy in range(y0, y1 + 1):
+                    self.cells.setdefault((gx, gy), []).append(i)
+        self.normalized = [normalize(t) for t in words.texts]
+        lengths = np.fromiter((len(t) for t in self.normalized), dtype=np.int64, count=len(self.normalized))
+        self.length_sums = np.concatenate(([0], np.cumsum(lengths)))
+        # Code point of every character and the word it belongs to, from which
+        # per-character running counts are built on first use.
+        self.codes = np.frombuffer(''.join(self.normalized).encode('utf-32-le'), dtype=np.uint32)
+        self.owners = np.repeat(np.arange(len(lengths)), lengths)
+        self.char_sums = {}
+        self.exact = {}
+        for i, text in enumerate(self.normalized):
+            if text:
+                self.exact.setdefault(text, []).append(i)
+
+    def region(self, x, y, w, h):
+        cell = self.cell
+        candidates = set()
+        for gx in range(x // cell, (x + w) // cell + 1):
+            for gy in range(y // cell, (y + h) // cell + 1):
+                candidates.update(self.cells.get((gx, gy), ()))
+        if not candidates:
+            return []
+        idx = np.fromiter(sorted(candidates), dtype=np.intp)
+        boxes = self.words.boxes[idx]
+        inside = (boxes[:, 0] < x + w) & (boxes[:, 2] > x) & (boxes[:, 1] < y + h) & (boxes[:, 3] > y)
+        return idx[inside].tolist()
+
+    def _char_sums(self, char):
+        sums = self.char_sums.get(char)
+        if sums is None:
+            counts = np.bincount(self.owners[self.codes == ord(char)], minlength=len(self.normalized))
+            sums = self.char_sums[char] = np.concatenate(([0], np.cumsum(counts)))
+        return sums
+
+    def _match(self, start, end, score):
+        words = self.words
+        box = words.boxes[start:end]
+        x0, y0 = box[:, :2].min(axis=0).tolist()
+        x1, y1 = box[:, 2:].max(axis=0).tolist()
+        return {
+            'text': ' '.join(words.texts[start:end]),
+            'score': round(score, 3),
+            'conf': round(float(words.conf[start:end].mean()), 1),
+            'box': [x0, y0, x1 - x0, y1 - y0],
+            'center': [(x0 + x1) // 2, (y0 + y1) // 2],
+        }
+
+    def find_text(self, query, min_score=0.75, region=None, limit=5):
+        target = ' '.join(t for t in (normalize(w) for w in query.split()) if t)
+        if not target:
+            return []
+        size = len(target.split())
+        allowed = None if region is None else set(self.region(*region))
+
+        if size == 1 and target in self.exact:
+            hits = [i for i in self.exact[target] if allowed is None or i in allowed]
+            if hits:
+                hits.sort(key=lambda i: -round(float(self.words.conf[i]), 1))
+                return [self._match(i, i + 1, 1.0) for i in hits[:limit]]
+
+        # A ratio of at least min_score bounds the candidate's length, which
+        # discards most windows before any string comparison is made.
+        count = len(self.words) - size + 1
+        if count <= 0:
+            return []
+        starts = np.arange(count)
+        lines = self.words.lines
+        window = self.length_sums[starts + size] - self.length_sums[starts] + size - 1
+        keep = (2 * np.minimum(window, len(target)) >= min_score * (window + len(target)))
+        keep &= lines[starts] == lines[starts + size - 1]
+        # Characters shared with the target, as a multiset, bound the ratio
+        # the same way SequenceMatcher.quick_ratio does.
+        shared = np.zeros(count, dtype=np.int64)
+        for char, n in Counter(target).items():
+            if char == ' ':
+                shared += min(size - 1, n)
+            else:
+                sums = self._char_sums(char)
+                shared += np.minimum(sums[starts + size] - sums[starts], n)
+        keep &= 2 * shared >= min_score * (window + len(target))
+        candidates = starts[keep].tolist()
+        if allowed is not None:
+            candidates = [i for i in candidates if i in allowed]
+
+        # Repeated words are scored once; boxes are only built for the winners.
+        matcher = SequenceMatcher(autojunk=False)
+        matcher.set_seq2(target)
+        scores = {}
+        ranked = []
+        for start in candidates:
+            text = ' '.join(self.normalized[start:start + size])
+            score = scores.get(text)
+            if score is None:
+                matcher.set_seq1(text)
+                score = scores[text] = matcher.ratio()
+            if score >= min_score:
+                ranked.append((-round(score, 3), -round(float(self.words.conf[start:start + size].mean()), 1), start, score))
+        ranked.sort()
+        return [self._match(start, start + size, score) for _, _, start, score in ranked[:limit]]
+
+
+class TileCache:
+    # LRU map from tile content hash to recognised text, bounded by the
+    # approximate memory held by its entries.
+    ENTRY_OVERHEAD = 120
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _size(self, key, value):
+        size = getattr(value, 'nbytes', None)
+        if size is None:
+            size = sys.getsizeof(value)
+        return len(key) + size + self.ENTRY_OVERHEAD
+
+    def get(self, key):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.bytes -= self._size(key, old)
+        self.entries[key] = value
+        self.bytes += self._size(key, value)
+        while self.bytes > self.max_bytes and self.entries:
+            old_key, old_value = self.entries.popitem(last=False)
+            self.bytes -= self._size(old_key, old_value)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+        }
+
+
+def blank_lines(pixels):
+    # Rows of pixels without ink: flat, or matching the typical value of every
+    # column, so sidebars, borders and scrollbar tracks crossing a row do not
+    # count as ink. Pass the transpose to test columns.
+    reference = np.median(pixels[::8], axis=0).astype(np.int16)
+    flat = (pixels.max(axis=1).astype(np.int16) - pixels.min(axis=1)) < BLANK_THRESHOLD
+    plain = np.abs(pixels.astype(np.int16) - reference).max(axis=1) < BLANK_THRESHOLD
+    return flat | plain
+
+
+def blank_runs(blank):
+    # Start and end (exclusive) of every run of at least MIN_GAP blank lines.
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], blank.astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+    keep = ends - starts >= MIN_GAP
+    return starts[keep], ends[keep]
+
+
+def widest(starts, ends, positions, target):
+    # Index of the widest run, the nearest to target among equally wide ones:
+    # gaps between letters can be as wide as MIN_GAP at large font sizes, but
+    # never as wide as the gaps between words and lines around them.
+    return np.lexsort((np.abs(positions - target), starts - ends))[0]
+
+
+def find_cuts(blank, step):
+    # Cut in the middle of the widest run of blank lines near each nominal
+    # line of a fixed grid, so a local change only moves the cuts around it.
+    # With no run near a grid line there is no cut and the tile grows.
+    length = len(blank)
+    starts, ends = blank_runs(blank)
+    middles = (starts + ends) // 2
+    cuts = [0]
+    for nominal in range(step, length, step):
+        near = np.flatnonzero((middles > cuts[-1]) & (middles < length) & (np.abs(middles - nominal) <= step // 2))
+        if len(near):
+            cuts.append(int(middles[near[np.argmin(np.abs(middles[near] - nominal))]]))
+    cuts.append(length)
+    return cuts
+
+
+def snap_edge(rows, x, reach):
+    # Moves a tile edge outwards from x (to the left when reach is negative)
+    # into the widest gap between words of these rows at most |reach| away.
+    width = rows.shape[1]
+    if reach < 0:
+        lo, hi = max(x + reach, 0), min(x + MIN_GAP, width)
+    else:
+        lo, hi = max(x - MIN_GAP, 0), min(x + reach, width)
+    starts, ends = blank_runs(blank_lines(rows[:, lo:hi].T))
+    starts, ends = starts + lo, ends + lo
+    if reach < 0:
+        keep = starts < x
+        edges = np.minimum((starts + ends) // 2, x)[keep]
+    else:
+        keep = ends > x
+        edges = np.maximum((starts + ends) // 2, x)[keep]
+    if not len(edges):
+        return lo if reach < 0 else hi
+    return int(edges[widest(starts[keep], ends[keep], edges, x)])
+
+
+def split_tiles(gray, tile_size=DEFAULT_TILE_SIZE):
+    # Columns follow a fixed grid and each is cut into rows along lines with
+    # no ink inside that column alone, so a sidebar or a busy window elsewhere
+    # does not block the cut and a change only moves the cuts around it. A
+    # tile owns the words centred in its column and is widened into the gap
+    # between words on either side so none of them is clipped. Returns the
+    # box to recognise and the owned column span of every tile.
+    tile_w, tile_h = tile_size
+    height, width = gray.shape
+    xs = list(range(0, width, tile_w)) + [width]
+    if len(xs) > 2 and xs[-1] - xs[-2] < tile_w // 4:
+        del xs[-2]
+    tiles = []
+    for x0, x1 in zip(xs, xs[1:]):
+        ys = find_cuts(blank_lines(gray[:, x0:x1]), tile_h)
+        for y0, y1 in zip(ys, ys[1:]):
+            rows = gray[y0:y1]
+            left = snap_edge(rows, x0, -tile_w // 4) if x0 else 0
+            right = snap_edge(rows, x1, tile_w // 4) if x1 < width else width
+            tiles.append(((left, y0, right, y1), (x0, x1)))
+    return tiles
+
+
+class IncrementalOcr:
+    # Re-recognises only the tiles whose pixels are not already in the cache
+    # and regroups their words into lines across tile edges; plain text is
+    # rebuilt from those words too, so both outputs share the cache.
+    def __init__(self, engine, cache, tile_size=DEFAULT_TILE_SIZE):
+        self.engine = engine
+        self.cache = cache
+        self.tile_size = tile_size
+
+    def _tiles(self, image, parallel, kwargs):
+        gray = np.asarray(image.convert('L'))
+        settings = f'image_to_data|{kwargs["lang"]}|{kwargs["psm"]}|{kwargs["config"]}'.encode()
+        results = []
+        pending = []
+        stats = {'tiles': 0, 'blank': 0, 'recognised': 0}
+        for (x0, y0, x1, y1), owned in split_tiles(gray, self.tile_size):
+            stats['tiles'] += 1
+            tile = np.ascontiguousarray(gray[y0:y1, x0:x1])
+            if int(tile.max()) - int(tile.min()) < BLANK_THRESHOLD:
+                stats['blank'] += 1
+                continue
+            digest = hashlib.blake2b(settings, digest_size=16)
+            digest.update(b'%dx%d' % tile.shape)
+            digest.update(tile)
+            key = digest.digest()
+            value = self.cache.get(key)
+            if value is None:
+                pending.append((len(results), key, tile))
+            results.append([(x0, y0), owned, value])
+
+        if pending:
+            tiles = [tile for _, _, tile in pending]
+            if parallel is not None:
+                values = parallel.map('image_to_data', tiles, kwargs)
+            else:
+                values = [self.engine.image_to_data(Image.fromarray(tile), **kwargs) for tile in tiles]
+            for (i, key, _), value in zip(pending, values):
+                self.cache.put(key, value)
+                results[i][2] = value
+            stats['recognised'] = len(pending)
+
+        parts = []
+        for (dx, dy), (own0, own1), words in results:
+            centre = (words.boxes[:, 0] + words.boxes[:, 2]) // 2 + dx
+            parts.append((words.select((centre >= own0) & (centre < own1)), (dx, dy)))
+        return WordBoxes.concat(parts).reflowed(), stats
+
+    def image_to_string(self, image, lang=DEFAULT_LANG, psm=None, config='', parallel=None):
+        words, stats = self._tiles(image, parallel, {'lang': lang, 'psm': psm, 'config': config})
+        return words.text(), stats
+
+    def image_to_data(self, image, lang=DEFAULT_LANG, psm=None, config='', parallel=None):
+        return self._tiles(image, parallel, {'lang': lang, 'psm': psm, 'config': config})
+
+
+def _init_worker(lang):
+    global _worker_engine
+    # One recogniser per core: keep tesseract from spawning its own threads.
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+    _worker_engine = OcrEngine()
+    _worker_engine.warm(lang)
+
+
+def _worker_call(method, pixels, kwargs):
+    # Errors travel back pickled; tesseract's own exception types may not
+    # survive that, so only the message is sent.
+    try:
+        return getattr(_worker_engine, method)(Image.fromarray(pixels), **kwargs)
+    except Exception as e:
+        raise RuntimeError(str(e)) from None
+
+
+def band_layout(height, count, overlap=BAND_OVERLAP):
+    # Each band owns rows [own0, own1) and is cropped with half the overlap on
+    # either side, so any line shorter than the overlap is whole in its owner.
+    count = max(1, min(count, height // MIN_BAND_HEIGHT))
+    step = math.ceil(height / count)
+    bands = []
+    for own0 in range(0, height, step):
+        own1 = min(own0 + step, height)
+        bands.append((max(own0 - overlap // 2, 0), min(own1 + overlap // 2, height), own0, own1))
+    return bands
+
+
+class ParallelOcr:
+    # A pool of warm recognisers reused across requests. Frames are cut into
+    # overlapping horizontal bands (per region, e.g. per monitor); a word is
+    # kept only by the band that owns its vertical centre.
+    def __init__(self, workers=None, overlap=BAND_OVERLAP, lang=DEFAULT_LANG):
+        self.workers = workers or os.cpu_count() or 1
+        self.overlap = overlap
+        self.lang = lang
+        self._start()
+
+    def _start(self):
+        # spawn, not fork: forking while the stdin reader thread holds its
+        # lock deadlocks the children when multiprocessing closes stdin.
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker, initargs=(self.lang,))
+
+    def map(self, method, arrays, kwargs):
+        # One worker dying (a tesseract crash, the OOM killer) breaks the
+        # executor for good, so it is replaced and the batch retried once;
+        # if that breaks too the request fails but the next one gets a pool.
+        count = len(arrays)
+        for attempt in range(2):
+            try:
+                return list(self.pool.map(_worker_call, [method] * count, arrays, [kwargs] * count))
+            except BrokenProcessPool:
+                self.pool.shutdown(wait=False, cancel_futures=True)
+                self._start()
+                if attempt:
+                    raise
+
+    def image_to_data(self, image, lang=DEFAULT_LANG, psm=None, config='', regions=None):
+        gray = np.asarray(image.convert('L'))
+        height, width = gray.shape
+        regions = regions or [(0, 0, width, height)]
+        kwargs = {'lang': lang, 'psm': psm, 'config': config}
+        per_region = max(1, self.workers // len(regions))
+        bands = []
+        jobs = []
+        for x, y, w, h in regions:
+            region = gray[y:y + h, x:x + w]
+            for top, bottom, own0, own1 in band_layout(region.shape[0], per_region, self.overlap):
+                bands.append(np.ascontiguousarray(region[top:bottom]))
+                jobs.append((x, y + top, own0 - top, own1 - top))
+
+        parts = []
+        for words, (dx, dy, own0, own1) in zip(self.map('image_to_data', bands, kwargs), jobs):
+            centre = (words.boxes[:, 1] + words.boxes[:, 3]) // 2
+            parts.append((words.select((centre >= own0) & (centre < own1)), (dx, dy)))
+        return WordBoxes.concat(parts), {'bands': len(jobs), 'workers': self.workers}
+
+    def image_to_string(self, image, lang=DEFAULT_LANG, psm=None, config='', regions=None):
+        words, stats = self.image_to_data(image, lang=lang, psm=psm, config=config, regions=regions)
+        return words.text(), stats
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name=name)
+        # Before Python 3.13 attaching registers the segment for unlinking
+        # at exit, which would destroy the client's buffer.
+        if os.name == 'posix':
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+class RawSources:
+    # Shared-memory segments and mmap'd files stay attached between requests,
+    # since clients normally rewrite the same buffer in place every frame.
+    def __init__(self):
+        self._segments = {}
+        self._files = {}
+
+    def buffer(self, request):
+        raw = request['raw']
+        source = raw.get('source', 'file')
+        if source == 'inline':
+            return request['_payload']
+        if source == 'shm':
+            segment = self._segments.get(raw['name'])
+            if segment is None:
+                segment = self._segments[raw['name']] = attach_shared_memory(raw['name'])
+            return segment.buf
+        if source == 'file':
+            stat = os.stat(raw['path'])
+            key = (stat.st_ino, stat.st_size)
+            mapped = self._files.get(raw['path'])
+            if mapped is None or mapped[0] != key:
+                with open(raw['path'], 'rb') as f:
+                    mapped = self._files[raw['path']] = (key, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            return mapped[1]
+        raise ValueError(f'unknown raw source: {source}')
+
+    def close(self):
+        for segment in self._segments.values():
+            try:
+                segment.close()
+            except BufferError:
+                pass
+        self._segments.clear()
+        self._files.clear()
+
+
+def raw_layout(raw):
+    fmt = raw.get('format', 'BGRA').upper()
+    if fmt not in PIXEL_FORMATS:
+        raise ValueError(f'unknown pixel format: {fmt}')
+    width, height = int(raw['width']), int(raw['height'])
+    if width <= 0 or height <= 0:
+        raise ValueError(f'invalid frame size {width}x{height}')
+    stride = int(raw.get('stride', width * PIXEL_FORMATS[fmt][0]))
+    if stride < width * PIXEL_FORMATS[fmt][0]:
+        raise ValueError(f'stride {stride} is too small for {width} {fmt} pixels')
+    if int(raw.get('offset', 0)) < 0:
+        raise ValueError('offset must not be negative')
+    return fmt, width, height, stride
+
+
+def inline_length(raw):
+    # Bytes that follow an "inline" header, worked out from the fields alone
+    # so that a frame with an invalid layout can still be skipped; None when
+    # the header does not tell.
+    try:
+        offset, height = int(raw.get('offset', 0)), int(raw['height'])
+        if 'stride' in raw:
+            stride = int(raw['stride'])
+        else:
+            stride = int(raw['width']) * PIXEL_FORMATS[str(raw.get('format', 'BGRA')).upper()][0]
+    except (KeyError, TypeError, ValueError):
+        return None
+    if offset < 0 or height < 0 or stride < 0:
+        return None
+    return offset + stride * height
+
+
+def frame_from_raw(buffer, raw):
+    # A view over the caller's buffer; nothing is copied until preprocessing.
+    fmt, width, height, stride = raw_layout(raw)
+    bpp = PIXEL_FORMATS[fmt][0]
+    rows = np.frombuffer(buffer, dtype=np.uint8, count=stride * height, offset=int(raw.get('offset', 0)))
+    pixels = rows.reshape(height, stride)[:, :width * bpp]
+    if bpp == 1:
+        return pixels, fmt
+    return pixels.reshape(height, width, bpp), fmt
+
+
+def to_gray(pixels, fmt):
+    if PIXEL_FORMATS[fmt][1] is None:
+        return pixels
+    r, g, b = (pixels[..., i] for i in PIXEL_FORMATS[fmt][1])
+    # ITU-R 601 weights in 8.8 fixed point; the sum fits in uint16.
+    gray = np.multiply(r, 77, dtype=np.uint16)
+    gray += np.multiply(g, 150, dtype=np.uint16)
+    gray += np.multiply(b, 29, dtype=np.uint16)
+    return (gray >> 8).astype(np.uint8)
+
+
+def to_rgb(pixels, fmt):
+    order = PIXEL_FORMATS[fmt][1]
+    if order is None or (order == (0, 1, 2) and pixels.shape[2] == 3):
+        return pixels
+    return pixels[..., list(order)]
+
+
+def downscale(gray, max_side):
+    factor = math.ceil(max(gray.shape) / max_side)
+    if factor <= 1:
+        return gray, 1
+    height, width = (n // factor * factor for n in gray.shape)
+    blocks = gray[:height, :width].reshape(height // factor, factor, width // factor, factor)
+    return (blocks.sum(axis=(1, 3), dtype=np.uint32) // (factor * factor)).astype(np.uint8), factor
+
+
+def otsu_threshold(gray):
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    omega = np.cumsum(hist) / gray.size
+    mu = np.cumsum(hist * np.arange(256)) / gray.size
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (mu[-1] * omega - mu) ** 2 / (omega * (1 - omega))
+    return int(np.nanargmax(between))
+
+
+def binarize(gray, threshold='otsu'):
+    if threshold == 'otsu':
+        threshold = otsu_threshold(gray)
+    light = gray > int(threshold)
+    # Tesseract expects dark text on a light page; flip dark themes.
+    if np.count_nonzero(light) * 2 < light.size:
+        light = ~light
+    return light.view(np.uint8) * np.uint8(255)
+
+
+def preprocess(pixels, fmt, options):
+    # Returns the image for tesseract and the (scale, dx, dy) mapping its
+    # coordinates back to the original frame.
+    dx = dy = 0
+    roi = options.get('roi')
+    if roi:
+        x, y, w, h = (max(int(v), 0) for v in roi)
+        pixels = pixels[y:y + h, x:x + w]
+        dx, dy = x, y
+    scale = 1
+    if not options.get('grayscale', True) and not options.get('max_side') and not options.get('binarize'):
+        return Image.fromarray(to_rgb(pixels, fmt)), (scale, dx, dy)
+    gray = to_gray(pixels, fmt)
+    if options.get('max_side'):
+        gray, scale = downscale(gray, int(options['max_side']))
+    if options.get('binarize'):
+        gray = binarize(gray, 'otsu' if options['binarize'] is True else options['binarize'])
+    return Image.fromarray(np.ascontiguousarray(gray)), (scale, dx, dy)
+
+
+def has_frame(request):
+    return 'image' in request or 'image_b64' in request or 'raw' in request
+
+
+def load_image(request):
+    if 'image' in request:
+        image = Image.open(request['image'])
+    elif 'image_b64' in request:
+        image = Image.open(io.BytesIO(base64.b64decode(request['image_b64'])))
+    else:
+        raise ValueError('request needs "image", "image_b64" or "raw"')
+    image.load()
+    return image
+
+
+def load_frame(request, sources):
+    options = request.get('preprocess')
+    if 'raw' in request:
+        pixels, fmt = frame_from_raw(sources.buffer(request), request['raw'])
+        return preprocess(pixels, fmt, options or {})
+    image = load_image(request)
+    if options is None:
+        return image, (1, 0, 0)
+    if image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+    return preprocess(np.asarray(image), image.mode, options)
+
+
+def handle_request(engine, request, incremental=None, sources=None, parallel=None):
+    timings = {}
+    start = time.perf_counter()
+    image, (scale, dx, dy) = load_frame(request, sources or RawSources())
+    timings['load_ms'] = elapsed_ms(start)
+
+    options = request.get('options', {})
+    kwargs = {
+        'lang': request.get('lang', DEFAULT_LANG),
+        'psm': options.get('psm'),
+        'config': options.get('config', ''),
+    }
+    method = 'image_to_data' if request.get('output') == 'data' else 'image_to_string'
+    response = {'timings': timings}
+    step = time.perf_counter()
+    if parallel is None or not request.get('parallel'):
+        parallel = None
+    if incremental is not None and request.get('incremental'):
+        result, response['tiles'] = getattr(incremental, method)(image, parallel=parallel, **kwargs)
+        response['cache'] = incremental.cache.stats()
+    elif parallel is not None:
+        # regions are in the coordinates of the (preprocessed) image
+        result, response['bands'] = getattr(parallel, method)(image, regions=request.get('regions'), **kwargs)
+    else:
+        result = getattr(engine, method)(image, **kwargs)
+    timings['ocr_ms'] = elapsed_ms(step)
+    if method == 'image_to_data':
+        if (scale, dx, dy) != (1, 0, 0):
+            result = result.transformed(scale, dx, dy)
+        response['text'] = result.text()
+        response['data'] = result
+    else:
+        response['text'] = result
+    return response
+
+
+def query_index(index, request):
+    if index is None:
+        raise ValueError('no word boxes yet; send a request with "output": "data" first')
+    if 'find' in request:
+        return {'matches': index.find_text(
+            request['find'],
+            min_score=request.get('min_score', 0.75),
+            region=request.get('region'),
+            limit=request.get('limit', 5),
+        )}
+    if 'region' not in request:
+        raise ValueError('request needs "image", "find" or "region"')
+    words = index.words
+    found = []
+    for i in index.region(*request['region']):
+        x0, y0, x1, y1 = words.boxes[i].tolist()
+        found.append([words.texts[i], x0, y0, x1 - x0, y1 - y0])
+    return {'words': found}
+
+
+class OcrServer:
+    # Requests from any number of readers are funnelled through one queue so
+    # the engine (and tesseract's own threads) are only driven from here.
+    def __init__(self, engine, incremental=None, parallel=None):
+        self.engine = engine
+        self.incremental = incremental
+        self.parallel = parallel
+        self.index = None
+        self.sources = RawSources()
+        self.requests = queue.Queue()
+
+    def submit(self, request, reply):
+        self.requests.put((time.perf_counter(), request, reply))
+
+    def stop(self):
+        self.requests.put(None)
+
+    def handle(self, request):
+        # Requests without an image query the word boxes of the last frame.
+        if not has_frame(request):
+            step = time.perf_counter()
+            response = query_index(self.index, request)
+            response['timings'] = {'query_ms': elapsed_ms(step)}
+            return response
+
+        response = handle_request(self.engine, request, self.incremental, self.sources, self.parallel)
+        words = response.pop('data', None)
+        if words is not None:
+            step = time.perf_counter()
+            self.index = SpatialIndex(words)
+            response['timings']['index_ms'] = elapsed_ms(step)
+            response['data'] = words.to_json()
+            if 'find' in request or 'region' in request:
+                response.update(query_index(self.index, request))
+        return response
+
+    def serve_forever(self):
+        while True:
+            item = self.requests.get()
+            if item is None:
+                break
+            queued_at, request, reply = item
+            started = time.perf_counter()
+            response = {'id': request.get('id')}
+            try:
+                response.update(self.handle(request))
+                response['timings']['queue_ms'] = round((started - queued_at) * 1000, 2)
+                response['timings']['total_ms'] = elapsed_ms(queued_at)
+            except Exception as e:
+                response['error'] = str(e)
+            reply(response)
+
+
+def read_requests(stream, server, reply):
+    # stream is binary: "inline" raw frames send their pixels right after
+    # the JSON header line. A bad header gets an error reply and its payload
+    # is skipped; only when the payload size cannot be worked out from the
+    # header (see inline_length) is the stream dropped, since there is no way
+    # to find the next request in it.
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            reply({'id': None, 'error': f'invalid JSON: {e}'})
+            continue
+        if not isinstance(request, dict):
+            reply({'id': None, 'error': 'request must be a JSON object'})
+            continue
+        raw = request.get('raw')
+        if raw is not None and not isinstance(raw, dict):
+            reply({'id': request.get('id'), 'error': '"raw" must be a JSON object'})
+            continue
+        if raw is not None and raw.get('source') == 'inline':
+            length = inline_length(raw)
+            if length is None:
+                reply({'id': request.get('id'),
+                       'error': 'cannot tell the size of the inline payload; closing the stream'})
+                break
+            payload = stream.read(length)
+            if len(payload) < length:
+                reply({'id': request.get('id'), 'error': 'stream ended inside the inline payload'})
+                break
+            try:
+                raw_layout(raw)
+            except (KeyError, TypeError, ValueError) as e:
+                reply({'id': request.get('id'), 'error': str(e)})
+                continue
+            request['_payload'] = payload
+        server.submit(request, reply)
+
+
+def serve_stdio(server):
+    lock = threading.Lock()
+
+    def reply(response):
+        with lock:
+            sys.stdout.write(json.dumps(response) + '\n')
+            sys.stdout.flush()
+
+    def reader():
+        try:
+            read_requests(sys.stdin.buffer, server, reply)
+        finally:
+            server.stop()
+
+    reply({'id': None, 'ready': True})
+    threading.Thread(target=reader, daemon=True).start()
+    server.serve_forever()
+
+
+def serve_socket(server, path):
+    if not hasattr(socket, 'AF_UNIX'):
+        raise SystemExit('Unix sockets are not supported on this platform')
+    if os.path.exists(path):
+        os.unlink(path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+
+    def handle(conn):
+        lock = threading.Lock()
+        stream = conn.makefile('rwb')
+
+        def reply(response):
+            with lock:
+                try:
+                    stream.write((json.dumps(response) + '\n').encode())
+                    stream.flush()
+                except OSError:
+                    pass
+
+        with conn, stream:
+            read_requests(stream, server, reply)
+
+    def accept():
+        while True:
+            conn, _ = listener.accept()
+            threading.Thread(target=handle, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.close()
+        os.unlink(path)
+
+
+def parse_size(value):
+    width, _, height = value.lower().partition('x')
+    return int(width), int(height or width)
+
+
+def main():
+    parser = argparse.ArgumentParser(usage='python ocr.py <image_path> | --server [--socket PATH]')
+    parser.add_argument('image_path', nargs='?')
+    parser.add_argument('--server', action='store_true', help='read JSON line requests until EOF')
+    parser.add_argument('--socket', help='listen on a Unix socket instead of stdin/stdout')
+    parser.add_argument('--lang', default=DEFAULT_LANG)
+    parser.add_argument('--data', action='store_true', help='print words, lines and blocks with boxes as JSON')
+    parser.add_argument('--find', help='print the best matches for this text as JSON')
+    parser.add_argument('--tile-size', type=parse_size, default=DEFAULT_TILE_SIZE,
+                        help='nominal tile size of incremental requests, e.g. 512x256')
+    parser.add_argument('--cache-mb', type=float, default=DEFAULT_CACHE_MB,
+                        help='memory limit of the tile result cache')
+    parser.add_argument('--workers', type=int,
+                        help='recogniser processes for parallel requests (default: CPU count; '
+                             'the one-shot CLI only goes parallel when this is above 1)')
+    parser.add_argument('--overlap', type=int, default=BAND_OVERLAP, help='band overlap in pixels')
+    args = parser.parse_args()
+
+    # Plain text from an image file only needs pytesseract and Pillow.
+    if np is None and (args.server or args.socket or args.data or args.find or (args.workers or 0) > 1):
+        parser.error('numpy is required for --server, --socket, --data, --find and --workers (pip install numpy)')
+
+    if args.server or args.socket:
+        if tesserocr is None:
+            print('ocr.py: tesserocr is not installed, every request runs the tesseract CLI', file=sys.stderr)
+        engine = OcrEngine()
+        engine.warm(args.lang)
+        cache = TileCache(int(args.cache_mb * 1024 * 1024))
+        parallel = ParallelOcr(args.workers, args.overlap, args.lang)
+        server = OcrServer(engine, IncrementalOcr(engine, cache, args.tile_size), parallel)
+        try:
+            if args.socket:
+                serve_socket(server, args.socket)
+            else:
+                serve_stdio(server)
+        finally:
+            parallel.close()
+            server.sources.close()
+            engine.close()
+        return
+
+    if not args.image_path:
+        print('Usage: python ocr.py <image_path>')
+        sys.exit(1)
+
+    image = Image.open(args.image_path)
+    if args.workers and args.workers > 1:
+        parallel = ParallelOcr(args.workers, args.overlap, args.lang)
+        try:
+            words, _ = parallel.image_to_data(image, lang=args.lang)
+        finally:
+            parallel.close()
+    elif args.data or args.find:
+        words = OcrEngine().image_to_data(image, lang=args.lang)
+    else:
+        print(pytesseract.image_to_string(image, lang=args.lang))
+        return
+
+    if args.find:
+        print(json.dumps(SpatialIndex(words).find_text(args.find), ensure_ascii=False))
+    elif args.data:
+        print(json.dumps(words.to_json(), ensure_ascii=False))
+    else:
+        print(words.text())
+
 
-image_path = sys.argv[1]
-text = pytesseract.image_to_string(Image.open(image_path), lang='por')
-print(text)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
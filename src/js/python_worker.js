@@ -0,0 +1,108 @@
+// PythonWorker: processo Python residente que troca mensagens em linhas JSON via stdin/stdout
+const { spawn } = require('child_process');
+const readline = require('readline');
+
+const DEFAULT_TIMEOUT = 60000;
+
+// Erros com notStarted = true vêm de um processo que não chegou a enviar a
+// linha {"ready": true}; só nesse caso é seguro repetir a ação por outro caminho
+class PythonWorker {
+    constructor(script, args = [], python = 'python', timeout = DEFAULT_TIMEOUT) {
+        this.script = script;
+        this.args = args;
+        this.python = python;
+        this.timeout = timeout;
+        this.proc = null;
+        this.ready = false;
+        this.pending = new Map();
+        this.nextId = 1;
+    }
+
+    start() {
+        if (this.proc) return;
+        const proc = spawn(this.python, [this.script, ...this.args], { stdio: ['pipe', 'pipe', 'inherit'] });
+        this.proc = proc;
+        this.ready = false;
+
+        const lines = readline.createInterface({ input: proc.stdout });
+        lines.on('line', (line) => {
+            let msg;
+            try {
+                msg = JSON.parse(line);
+            } catch (e) {
+                return;
+            }
+            if (msg.ready && this.proc === proc) {
+                this.ready = true;
+                return;
+            }
+            const waiter = this.pending.get(msg.id);
+            if (!waiter) return;
+            this.pending.delete(msg.id);
+            clearTimeout(waiter.timer);
+            if (msg.error) waiter.reject(new Error(msg.error));
+            else waiter.resolve(msg);
+        });
+
+        const fail = (error) => {
+            if (this.proc !== proc) return;
+            error.notStarted = !this.ready;
+            this.proc = null;
+            for (const waiter of this.pending.values()) {
+                clearTimeout(waiter.timer);
+                waiter.reject(error);
+            }
+            this.pending.clear();
+        };
+        proc.on('error', fail);
+        proc.on('exit', (code) => fail(new Error(`Processo Python encerrado (código ${code})`)));
+        proc.stdin.on('error', fail);
+    }
+
+    // Envia uma requisição e resolve com a resposta de mesmo id. Se a resposta
+    // não chegar em `timeout` ms o processo é encerrado, já que um servidor
+    // travado não responderia às próximas requisições
+    request(payload, timeout = this.timeout) {
+        this.start();
+        const id = this.nextId++;
+        const proc = this.proc;
+        return new Promise((resolve, reject) => {
+            const timer = setTimeout(() => {
+                if (!this.pending.delete(id)) return;
+                const error = new Error(`Sem resposta do processo Python em ${timeout} ms`);
+                error.notStarted = false;
+                reject(error);
+                if (this.proc === proc) this.kill();
+            }, timeout);
+            this.pending.set(id, { resolve, reject, timer });
+            proc.stdin.write(JSON.stringify({ ...payload, id }) + '\n');
+        });
+    }
+
+    kill() {
+        // Solta o processo antes de matá-lo: o próximo request() já inicia
+        // um novo em vez de escrever no stdin de um que está morrendo.
+        const proc = this.proc;
+        if (!proc) return;
+        this.proc = null;
+        for (const waiter of this.pending.values()) {
+            clearTimeout(waiter.timer);
+            waiter.reject(new Error('Processo Python encerrado'));
+        }
+        this.pending.clear();
+        proc.kill();
+    }
+
+    stop() {
+        if (!this.proc) return;
+        this.proc.stdin.end();
+        this.proc = null;
+        for (const waiter of this.pending.values()) {
+            clearTimeout(waiter.timer);
+            waiter.reject(new Error('Processo Python encerrado'));
+        }
+        this.pending.clear();
+    }
+}
+
+module.exports = { PythonWorker };
@@ -1,14 +1,19 @@
 // TaskExecutor: executor autônomo de tarefas para o Obelisk
 const { ObeliskAgent } = require('./agent');
+const { PythonWorker } = require('./python_worker');
 const fs = require('fs');
 const path = require('path');
 const MEMORY_PATH = path.join(__dirname, '../../data/task_memory.json');
+const FRAME_PATH = path.join(__dirname, '../../data/autotask.raw');
+const WAIT_STABLE = { action: 'wait_stable', timeout: 3, settle: 0.3 };
 
 
 
 class TaskExecutor {
     constructor(ollamaUrl, model) {
         this.agent = new ObeliskAgent(ollamaUrl, model);
+        this.ocrWorker = new PythonWorker(path.join(__dirname, 'ocr.py'), ['--server']);
+        this.actionWorker = new PythonWorker(path.join(__dirname, 'automator.py'), ['--server']);
         this.loadMemory();
     }
 
@@ -37,12 +42,68 @@ class TaskExecutor {
     }
 
     async getScreenText() {
-        // Captura screenshot e executa OCR Python
+        // Captura os pixels crus num arquivo que o servidor OCR mantém mapeado,
+        // sem codificar PNG; só usa o screenshot PNG se algum worker falhar
+        try {
+            const capture = await this.actionWorker.request({ actions: [{ action: 'capture', path: FRAME_PATH }] });
+            const [shot] = capture.results;
+            if (!shot.ok) throw new Error(shot.error);
+            const response = await this.ocrWorker.request({ raw: shot.result, incremental: true, parallel: true, output: 'data' });
+            return response.text;
+        } catch (e) {
+            console.warn(`Captura direta indisponível, usando screenshot PNG: ${e.message}`);
+        }
         const { execSync } = require('child_process');
         const vision = new (require('./vision').VisionAgent)();
         const imgFile = await vision.saveScreenshot('autotask.png');
-        const ocrResult = execSync(`python "${__dirname}/ocr.py" "${imgFile}"`, { encoding: 'utf-8' });
-        return ocrResult;
+        try {
+            const response = await this.ocrWorker.request({ image: imgFile, incremental: true, parallel: true, output: 'data' });
+            return response.text;
+        } catch (e) {
+            // Servidor OCR indisponível: volta para o modo de execução única
+            const ocrResult = execSync(`python "${__dirname}/ocr.py" "${imgFile}"`, { encoding: 'utf-8' });
+            return ocrResult;
+        }
+    }
+
+    // Executa um lote de ações no automator residente e espera a tela estabilizar;
+    // só usa o comando de execução única se o automator nem chegou a iniciar
+    async runActions(actions, fallbackArgs) {
+        let response;
+        try {
+            response = await this.actionWorker.request({ actions: [...actions, WAIT_STABLE] });
+        } catch (e) {
+            // Se o worker morreu no meio do lote, parte das ações pode já ter rodado:
+            // repetir pelo modo de execução única duplicaria cliques e digitação
+            if (!e.notStarted) throw e;
+            const { execSync } = require('child_process');
+            return execSync(`python "${__dirname}/automator.py" ${fallbackArgs}`, { encoding: 'utf-8' }).trim();
+        }
+        const results = response.results.slice(0, actions.length);
+        const settled = response.results[actions.length];
+        // wait_stable responde ok: true com stable: false quando o tempo acaba
+        if (settled && !settled.ok) console.warn(`Tela não estabilizou após as ações: ${settled.error}`);
+        else if (settled && settled.result && settled.result.stable === false) {
+            console.warn(`Tela não estabilizou em ${WAIT_STABLE.timeout} s após as ações`);
+        }
+        const failed = results.find((r) => !r.ok);
+        if (failed) throw new Error(failed.error);
+        return results.filter((r) => typeof r.result === 'string').map((r) => r.result).join('; ');
+    }
+
+    // Clica no centro do texto usando as caixas de palavras da última leitura de tela
+    async clickText(target) {
+        let match = null;
+        try {
+            const response = await this.ocrWorker.request({ find: target, limit: 1 });
+            match = response.matches[0];
+        } catch (e) {
+            return await this.runActions([{ action: 'click_text', text: target }], `click_text "${target}"`);
+        }
+        if (!match) return `Texto não encontrado na tela: ${target}`;
+        const [x, y] = match.center;
+        await this.runActions([{ action: 'click', x, y }], `click ${x} ${y}`);
+        return `Clique em "${match.text}" (${x},${y})`;
     }
 
     async decideAndAct(taskDescription) {
@@ -50,7 +111,7 @@ class TaskExecutor {
         const screenText = await this.getScreenText();
         this.lastScreenText = screenText;
         // 2. Pergunta ao LLM qual ação tomar
-        const prompt = `Você é um agente autônomo com acesso à tela do usuário.\n\nPedido do usuário: "${taskDescription}"\n\nTexto visível na tela:\n${screenText}\n\nDiga a próxima ação a ser tomada, em formato JSON:\n{\n  "action": "click|type|open_url|search|none|done",\n  "target": "(descreva o alvo: texto, botão, campo, url, etc)",\n  "value": "(texto a digitar, url, etc)",\n  "x": (opcional, coordenada x),\n  "y": (opcional, coordenada y)\n}\nSe a tarefa estiver concluída, use action: "done".`;
+        const prompt = `Você é um agente autônomo com acesso à tela do usuário.\n\nPedido do usuário: "${taskDescription}"\n\nTexto visível na tela:\n${screenText}\n\nDiga a próxima ação a ser tomada, em formato JSON:\n{\n  "action": "click|click_text|type|open_url|search|none|done",\n  "target": "(descreva o alvo: texto, botão, campo, url, etc)",\n  "value": "(texto a digitar, url, etc)",\n  "x": (opcional, coordenada x),\n  "y": (opcional, coordenada y)\n}\nPara clicar em um texto visível, prefira action: "click_text" com o texto exato em "target".\nSe a tarefa estiver concluída, use action: "done".`;
         const response = await this.agent.sendMessage(prompt);
         let actionObj = {};
         try {
@@ -64,12 +125,12 @@ class TaskExecutor {
         let result = '';
         try {
             if (actionObj.action === 'click' && actionObj.x && actionObj.y) {
-                const { execSync } = require('child_process');
-                execSync(`python "${__dirname}/automator.py" click ${actionObj.x} ${actionObj.y}`);
+                await this.runActions([{ action: 'click', x: actionObj.x, y: actionObj.y }], `click ${actionObj.x} ${actionObj.y}`);
                 result = `Clique em (${actionObj.x},${actionObj.y})`;
+            } else if (actionObj.action === 'click_text' && actionObj.target) {
+                result = await this.clickText(actionObj.target);
             } else if (actionObj.action === 'type' && actionObj.value) {
-                const { execSync } = require('child_process');
-                execSync(`python "${__dirname}/automator.py" write "${actionObj.value}"`);
+                await this.runActions([{ action: 'write', text: actionObj.value }], `write "${actionObj.value}"`);
                 result = `Texto digitado: ${actionObj.value}`;
             } else if (actionObj.action === 'open_url' && actionObj.value) {
                 const { execSync } = require('child_process');
@@ -102,6 +163,8 @@ class TaskExecutor {
             result = await this.decideAndAct(taskDescription);
             if (this.finished) break;
         }
+        this.ocrWorker.stop();
+        this.actionWorker.stop();
         this.saveMemory();
         return this.finished ? 'Tarefa finalizada!' : 'Limite de iterações atingido.';
     }